@@ -10,7 +10,7 @@
    - SSH目录权限检查
 
 2. **密钥管理**：
-   - 使用系统ssh-keygen生成RSA密钥对
+   - 在进程内生成RSA或Ed25519密钥对（无需调用ssh-keygen）
    - 自动设置正确的文件权限
    - 支持密钥备份和恢复
 
@@ -84,6 +84,18 @@ python ssh_automation.py
    4. 部署SSH密钥
    5. 验证部署结果
 
+4. **批量部署**：
+
+可在脚本中调用 `deploy_to_hosts` 并行部署到多台服务器。安装可选依赖 `asyncssh`（`pip install asyncssh`）后使用asyncio并发连接所有服务器，否则使用线程池（并发数见 `ssh_automation.MAX_WORKERS`）：
+```python
+from ssh_automation import SSHAutomation
+
+results = SSHAutomation().deploy_to_hosts([
+    {'hostname': '10.0.0.1', 'port': 22, 'username': 'root', 'password': '***'},
+    {'hostname': '10.0.0.2', 'port': 22, 'username': 'root', 'password': '***'},
+])
+```
+
 ## 配置说明
 
 配置文件 `config.py` 包含以下设置：
@@ -94,16 +106,18 @@ SSH_CONFIG = {
     'remote_host': '',  # 远程服务器IP或域名
     'remote_port': 22,  # SSH端口号
     'username': '',     # 用户名
-    'password': ''      # 密码
+    'password': '',     # 密码
+    'connect_timeout': 5,     # 建立TCP连接及端口探测的超时时间（秒）
+    'keepalive_interval': 30  # 连接池中空闲连接的心跳间隔（秒），0表示禁用
 }
 ```
 
 2. **密钥配置**：
 ```python
 KEY_CONFIG = {
-    'key_filename': 'id_rsa',  # 密钥文件名
-    'key_type': 'rsa',        # 密钥类型
-    'key_bits': 4096,         # 密钥位数
+    'key_filename': '',       # 密钥文件名（留空时按密钥类型使用id_ed25519或id_rsa）
+    'key_type': 'ed25519',    # 密钥类型（ed25519 或 rsa）
+    'key_bits': 0,            # 密钥位数（仅rsa使用，0表示默认2048，可选4096）
     'key_comment': ''         # 密钥注释
 }
 ```
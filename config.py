@@ -2,20 +2,23 @@
 SSH自动化配置文件
 包含连接远程服务器所需的基本配置信息
 """
+import os
 
 # SSH连接配置
 SSH_CONFIG = {
     'remote_host': '',  # 远程服务器IP或域名
     'remote_port': 22,  # SSH端口号
     'username': '',     # 用户名
-    'password': ''      # 密码
+    'password': '',     # 密码
+    'connect_timeout': 5,   # 建立TCP连接的超时时间（秒）
+    'keepalive_interval': 30  # 连接池中空闲连接的心跳间隔（秒），0表示禁用
 }
 
 # SSH密钥配置
 KEY_CONFIG = {
-    'key_filename': 'id_rsa',     # 密钥文件名
-    'key_type': 'rsa',           # 密钥类型
-    'key_bits': 4096,            # 密钥位数（改为4096位）
+    'key_filename': '',          # 密钥文件名（留空时按密钥类型使用id_ed25519或id_rsa）
+    'key_type': 'ed25519',       # 密钥类型（ed25519 或 rsa）
+    'key_bits': 0,               # 密钥位数（仅rsa使用，0表示默认2048，可选4096；低于2048时按2048生成）
     'key_comment': ''            # 密钥注释
 }
 
@@ -25,8 +28,15 @@ PATH_CONFIG = {
     'authorized_keys': '~/.ssh/authorized_keys'  # 授权密钥文件
 }
 
+# 导入时展开为绝对路径，后续代码直接使用
+RESOLVED_PATHS = {
+    key: os.path.normpath(os.path.expanduser(path))
+    for key, path in PATH_CONFIG.items()
+}
+
 # 权限配置
 PERMISSION_CONFIG = {
+    'home_dir': 0o700,          # 远程用户主目录权限
     'ssh_dir': 0o700,           # .ssh目录权限
     'private_key': 0o600,       # 私钥文件权限
     'public_key': 0o644,        # 公钥文件权限
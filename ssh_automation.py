@@ -5,8 +5,11 @@ SSH自动化部署工具
 import os
 import sys
 import time
-from ssh_utils import SSHKeyManager
-from ui_manager import UIManager
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List
+from ssh_utils import SSHKeyManager, get_client, with_client, ASYNCSSH_AVAILABLE
+from ui_manager import UIManager, Spinner
 import paramiko
 from config import SSH_CONFIG
 import logging
@@ -15,12 +18,16 @@ logging.basicConfig(level=logging.INFO,
                    format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 并发执行SSH操作的线程数，不超过sshd默认的MaxStartups(10)
+MAX_WORKERS = 8
+
 class SSHAutomation:
     def __init__(self):
         """初始化SSH自动化工具"""
         self.ui = UIManager()
         self.ssh_manager = SSHKeyManager()
         self.conn_info = None
+        self._executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
 
     def run(self):
         """运行主程序"""
@@ -70,49 +77,131 @@ class SSHAutomation:
         if not self.conn_info:
             self.conn_info = self.ui.get_connection_info()
         
-        if self.ui.test_connection(self.conn_info):
-            try:
-                # 尝试SSH连接
-                ssh = paramiko.SSHClient()
-                ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-                ssh.connect(
-                    self.conn_info['hostname'],
-                    self.conn_info['port'],
-                    self.conn_info['username'],
-                    self.conn_info['password']
-                )
-                print("✅ SSH连接测试成功")
-                ssh.close()
-            except Exception as e:
-                print(f"❌ SSH连接失败: {str(e)}")
+        # SSH连接本身会暴露TCP层面的错误，无需额外的TCP探测
+        self.ui.test_connection(self.conn_info, probe_tcp=False)
+        try:
+            # 尝试SSH连接（连接保留在连接池中供后续操作复用）
+            get_client(self.conn_info)
+            print("✅ SSH连接测试成功")
+        except paramiko.SSHException as e:
+            print(f"❌ SSH连接失败: {str(e)}")
+        except OSError as e:
+            print(f"❌ 无法连接到服务器，请检查网络连接和防火墙设置: {str(e)}")
+        except Exception as e:
+            print(f"❌ SSH连接失败: {str(e)}")
 
     def deploy_ssh_key(self):
         """部署SSH密钥"""
         if not self.conn_info:
             self.conn_info = self.ui.get_connection_info()
         
-        self.ui.show_progress("正在生成密钥对")
+        # 本地生成密钥与建立远程连接互不依赖，并行执行
+        try:
+            with Spinner("正在生成密钥对并连接服务器"):
+                key_future = self._executor.submit(self.ssh_manager.generate_key_pair)
+                client_future = self._executor.submit(get_client, self.conn_info)
+                key_future.result()
+                client_future.result()
+        except Exception as e:
+            print(f"\n❌ SSH密钥部署失败: {str(e)}")
+            return
         
-        if self.ssh_manager.deploy_public_key(
-            self.conn_info['hostname'],
-            self.conn_info['username'],
-            self.conn_info['password'],
-            self.conn_info['port']
-        ):
-            self.ui.show_progress("正在验证部署")
-            if self.ssh_manager.verify_connection(
+        with Spinner("正在部署密钥对"):
+            deployed = self.ssh_manager.deploy_public_key(
                 self.conn_info['hostname'],
                 self.conn_info['username'],
+                self.conn_info['password'],
                 self.conn_info['port']
-            ):
+            )
+        
+        if deployed:
+            with Spinner("正在验证部署"):
+                verified = self.ssh_manager.verify_connection(
+                    self.conn_info['hostname'],
+                    self.conn_info['username'],
+                    self.conn_info['port']
+                )
+            if verified:
                 print("\n✅ SSH密钥部署成功！")
                 print(f"\n使用以下命令登录服务器：")
                 print(f"ssh {self.conn_info['username']}@{self.conn_info['hostname']}" + 
                       (f" -p {self.conn_info['port']}" if self.conn_info['port'] != 22 else ""))
-            else:
-                print("\n❌ SSH密钥认证验证失败")
+                return
+            print("\n❌ SSH密钥认证验证失败")
         else:
             print("\n❌ SSH密钥部署失败")
+        
+        # 部署结束后再复用连接检查远程配置，确保诊断结果反映部署后的权限
+        try:
+            with Spinner("正在检查远程服务器配置"):
+                report = with_client(self.conn_info, self.ssh_manager.inspect_remote_config)
+            self.ui.check_remote_config(report)
+        except Exception as e:
+            logger.warning(f"远程服务器配置检查失败: {str(e)}")
+
+    def deploy_to_hosts(self, conn_infos: List[Dict[str, any]]) -> Dict[str, bool]:
+        """并行部署SSH密钥到多台服务器，返回每台服务器的部署结果"""
+        # 预先生成密钥对，避免多个任务同时生成
+        self.ssh_manager.generate_key_pair()
+        
+        if ASYNCSSH_AVAILABLE:
+            # asyncio.run需要Python 3.7+，这里手动管理事件循环以兼容3.6
+            loop = asyncio.new_event_loop()
+            try:
+                return loop.run_until_complete(self._deploy_to_hosts_async(conn_infos))
+            finally:
+                loop.close()
+        
+        futures = {
+            self._executor.submit(self._deploy_and_verify, conn_info): conn_info
+            for conn_info in conn_infos
+        }
+        results = {}
+        for future in as_completed(futures):
+            results[self._host_label(futures[future])] = future.result()
+        return results
+
+    async def _deploy_to_hosts_async(self, conn_infos: List[Dict[str, any]]) -> Dict[str, bool]:
+        """使用asyncssh在单个事件循环中并发部署到多台服务器"""
+        # 与线程池保持相同的并发上限，避免同时发起过多连接
+        semaphore = asyncio.Semaphore(MAX_WORKERS)
+        
+        async def deploy_limited(conn_info: Dict[str, any]) -> bool:
+            async with semaphore:
+                return await self._deploy_and_verify_async(conn_info)
+        
+        results = await asyncio.gather(*[
+            deploy_limited(conn_info) for conn_info in conn_infos
+        ])
+        return {self._host_label(conn_info): result for conn_info, result in zip(conn_infos, results)}
+
+    async def _deploy_and_verify_async(self, conn_info: Dict[str, any]) -> bool:
+        """使用asyncssh部署公钥到单台服务器并验证密钥认证"""
+        return (
+            await self.ssh_manager.deploy_public_key_async(conn_info) and
+            await self.ssh_manager.verify_connection_async(conn_info)
+        )
+
+    def _deploy_and_verify(self, conn_info: Dict[str, any]) -> bool:
+        """部署公钥到单台服务器并验证密钥认证"""
+        return (
+            self.ssh_manager.deploy_public_key(
+                conn_info['hostname'],
+                conn_info['username'],
+                conn_info['password'],
+                conn_info['port']
+            ) and
+            self.ssh_manager.verify_connection(
+                conn_info['hostname'],
+                conn_info['username'],
+                conn_info['port']
+            )
+        )
+
+    @staticmethod
+    def _host_label(conn_info: Dict[str, any]) -> str:
+        """生成用于展示部署结果的主机标识"""
+        return f"{conn_info['username']}@{conn_info['hostname']}:{conn_info['port']}"
 
     def check_remote_config(self):
         """检查远程服务器配置"""
@@ -120,17 +209,9 @@ class SSHAutomation:
             self.conn_info = self.ui.get_connection_info()
         
         try:
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(
-                self.conn_info['hostname'],
-                self.conn_info['port'],
-                self.conn_info['username'],
-                self.conn_info['password']
-            )
-            
-            self.ui.check_remote_config(ssh)
-            ssh.close()
+            with Spinner("正在检查远程服务器配置"):
+                report = with_client(self.conn_info, self.ssh_manager.inspect_remote_config)
+            self.ui.check_remote_config(report)
             
         except Exception as e:
             print(f"❌ 无法连接到远程服务器: {str(e)}")
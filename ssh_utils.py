@@ -3,23 +3,232 @@ SSH工具类
 提供SSH密钥生成、部署和验证的核心功能
 """
 import os
+import re
+import hashlib
 import sys
+import atexit
+import socket
+import threading
 import paramiko
 from pathlib import Path
-from typing import Tuple, Optional
+from typing import Callable, Dict, List, Tuple, Optional, TypeVar
 import logging
-from config import SSH_CONFIG, KEY_CONFIG, PATH_CONFIG, PERMISSION_CONFIG
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519
+from config import SSH_CONFIG, KEY_CONFIG, RESOLVED_PATHS, PERMISSION_CONFIG
+
+# asyncssh为可选依赖，安装后批量部署使用asyncio并发，否则回退到paramiko线程池
+try:
+    import asyncssh
+except ImportError:
+    asyncssh = None
+
+ASYNCSSH_AVAILABLE = asyncssh is not None
 
 logging.basicConfig(level=logging.INFO,
                    format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 远程authorized_keys文件路径（SFTP相对路径以远程用户主目录为起点）
+_REMOTE_AUTHORIZED_KEYS = '.ssh/authorized_keys'
+
+# sshd的StrictModes会检查的远程路径（SFTP相对路径）及对应的PERMISSION_CONFIG键
+_REMOTE_PERMISSIONS = [
+    ('.', 'home_dir'),
+    ('.ssh', 'ssh_dir'),
+    (_REMOTE_AUTHORIZED_KEYS, 'authorized_keys')
+]
+
+# 无SFTP时修正上述路径权限的命令
+_FIX_PERMISSIONS_COMMAND = " && ".join(
+    f"chmod {PERMISSION_CONFIG[permission]:o} ~/{path}" for path, permission in _REMOTE_PERMISSIONS
+)
+
+# 写入authorized_keys后恢复SELinux安全上下文（如果存在），失败不影响部署结果
+_RESTORECON_COMMAND = 'command -v restorecon >/dev/null && restorecon -R -v ~/.ssh 2>/dev/null || true'
+
+# 远程服务器未启用sftp子系统时的提示
+_SFTP_UNAVAILABLE_HINT = "无法打开SFTP会话，远程sshd_config可能未启用sftp子系统(Subsystem sftp)，改为通过shell命令部署"
+
+# 无SFTP时读取远程authorized_keys的命令（文件不存在时输出为空）
+_READ_AUTHORIZED_KEYS_COMMAND = 'cat ~/.ssh/authorized_keys 2>/dev/null || true'
+
+# 无SFTP时从stdin追加公钥的命令，公钥内容不经过shell解析，无需转义
+_APPEND_AUTHORIZED_KEYS_COMMAND = 'cat >> ~/.ssh/authorized_keys && chmod 600 ~/.ssh/authorized_keys'
+
+# RSA密钥的最小位数，未配置或配置值更小时按此位数生成
+_MIN_RSA_KEY_BITS = 2048
+
+# 每次从SSH通道读取的最大字节数
+_RECV_BUFFER_SIZE = 65536
+
+# SSH连接池，按 (hostname, port, username, key_filename, 密码摘要) 复用已认证的连接
+# 密码认证与密钥认证的连接分开保存，确保密钥验证不会复用密码认证的连接；
+# 键中包含密码摘要，更换密码后会重新认证，而不是复用旧密码建立的连接
+PoolKey = Tuple[str, int, str, Optional[str], Optional[str]]
+_SSH_POOL: Dict[PoolKey, paramiko.SSHClient] = {}
+# 每个连接池键对应一把锁，保证多线程下同一主机只建立一个连接
+_POOL_LOCKS: Dict[PoolKey, threading.Lock] = {}
+_POOL_LOCKS_GUARD = threading.Lock()
+
+T = TypeVar('T')
+
+def _pool_key(conn_info: Dict[str, any]) -> PoolKey:
+    """生成连接池键"""
+    key_filename = conn_info.get('key_filename')
+    password = None if key_filename else conn_info.get('password')
+    password_digest = hashlib.sha256(password.encode()).hexdigest() if password is not None else None
+    return (conn_info['hostname'], conn_info['port'], conn_info['username'], key_filename, password_digest)
+
+def _pool_lock(pool_key: PoolKey) -> threading.Lock:
+    """获取连接池键对应的锁"""
+    with _POOL_LOCKS_GUARD:
+        return _POOL_LOCKS.setdefault(pool_key, threading.Lock())
+
+def get_client(conn_info: Dict[str, any]) -> paramiko.SSHClient:
+    """从连接池获取可用的SSH连接，连接失效时重新建立（conn_info含key_filename时仅使用该私钥认证）"""
+    key_filename = conn_info.get('key_filename')
+    pool_key = _pool_key(conn_info)
+
+    with _pool_lock(pool_key):
+        ssh = _SSH_POOL.get(pool_key)
+        if ssh is not None:
+            transport = ssh.get_transport()
+            if transport is not None and transport.is_active():
+                return ssh
+            logger.info("SSH连接已断开，正在重新连接")
+            ssh.close()
+            del _SSH_POOL[pool_key]
+
+        ssh = paramiko.SSHClient()
+        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        if key_filename:
+            ssh.connect(
+                conn_info['hostname'],
+                conn_info['port'],
+                conn_info['username'],
+                key_filename=key_filename,
+                allow_agent=False,
+                look_for_keys=False,
+                timeout=SSH_CONFIG['connect_timeout']
+            )
+        else:
+            ssh.connect(
+                conn_info['hostname'],
+                conn_info['port'],
+                conn_info['username'],
+                conn_info['password'],
+                # 仅使用密码认证，确保连接池键中的密码摘要与实际认证方式一致
+                allow_agent=False,
+                look_for_keys=False,
+                timeout=SSH_CONFIG['connect_timeout']
+            )
+        # 定期发送心跳，防止空闲连接被NAT或防火墙断开
+        ssh.get_transport().set_keepalive(SSH_CONFIG['keepalive_interval'])
+        _SSH_POOL[pool_key] = ssh
+        return ssh
+
+def evict_client(conn_info: Dict[str, any], ssh: paramiko.SSHClient) -> None:
+    """从连接池移除并关闭失效的连接（仅当池中仍是该连接时移除，避免误删其他线程新建的连接）"""
+    pool_key = _pool_key(conn_info)
+    with _pool_lock(pool_key):
+        if _SSH_POOL.get(pool_key) is ssh:
+            del _SSH_POOL[pool_key]
+    ssh.close()
+
+def with_client(conn_info: Dict[str, any], action: Callable[[paramiko.SSHClient], T]) -> T:
+    """在池化连接上执行action；打开通道或SFTP会话抛出SSHException时视为连接已失效，重新连接后重试一次"""
+    ssh = get_client(conn_info)
+    try:
+        return action(ssh)
+    except paramiko.SSHException as e:
+        logger.info(f"SSH连接不可用({str(e)})，正在重新连接")
+        evict_client(conn_info, ssh)
+        return action(get_client(conn_info))
+
+def close_pool() -> None:
+    """关闭连接池中的所有SSH连接"""
+    while _SSH_POOL:
+        _, ssh = _SSH_POOL.popitem()
+        ssh.close()
+
+atexit.register(close_pool)
+
+def _run(ssh: paramiko.SSHClient, cmd: str, stdin: Optional[bytes] = None) -> Tuple[bytes, bytes, int]:
+    """在新通道中执行命令，交替读取stdout和stderr，避免任一输出流写满缓冲区而阻塞（stdin非空时先写入并关闭输入流）"""
+    chan = ssh.get_transport().open_session()
+    try:
+        chan.exec_command(cmd)
+        if stdin is not None:
+            chan.sendall(stdin)
+            chan.shutdown_write()
+        out, err = bytearray(), bytearray()
+        while not chan.exit_status_ready():
+            received = False
+            if chan.recv_ready():
+                out += chan.recv(_RECV_BUFFER_SIZE)
+                received = True
+            if chan.recv_stderr_ready():
+                err += chan.recv_stderr(_RECV_BUFFER_SIZE)
+                received = True
+            if not received:
+                # 命令结束时立即唤醒，否则短暂等待新数据
+                chan.status_event.wait(0.01)
+        exit_status = chan.recv_exit_status()
+        # 读取命令结束后剩余的输出，直到对端关闭输出流
+        for chunk in iter(lambda: chan.recv(_RECV_BUFFER_SIZE), b''):
+            out += chunk
+        for chunk in iter(lambda: chan.recv_stderr(_RECV_BUFFER_SIZE), b''):
+            err += chunk
+        return bytes(out), bytes(err), exit_status
+    finally:
+        chan.close()
+
+def _open_sftp(ssh: paramiko.SSHClient) -> Optional[paramiko.SFTPClient]:
+    """打开SFTP会话；连接仍然可用但服务器拒绝sftp子系统时返回None，连接已断开时抛出异常交由with_client重连"""
+    try:
+        return ssh.open_sftp()
+    except paramiko.SSHException:
+        transport = ssh.get_transport()
+        if transport is not None and transport.is_active():
+            return None
+        raise
+
+def _split_sections(output: str) -> Dict[str, List[str]]:
+    """按 ##NAME## 分隔行拆分远程脚本输出"""
+    sections: Dict[str, List[str]] = {}
+    current = None
+    for line in output.splitlines():
+        line = line.strip()
+        if line.startswith('##') and line.endswith('##') and len(line) > 4:
+            current = sections.setdefault(line[2:-2], [])
+        elif current is not None and line:
+            current.append(line)
+    return sections
+
+def _key_present(public_key: str, content: str) -> bool:
+    """判断authorized_keys内容中是否已包含该公钥（按密钥数据比较，忽略注释和选项，跳过被注释掉的行）"""
+    key_data = public_key.split()[1]
+    return any(
+        key_data in line.split()
+        for line in content.splitlines()
+        if not line.lstrip().startswith('#')
+    )
+
+def _authorized_keys_entry(public_key: str, existing: str) -> str:
+    """生成追加到authorized_keys的内容，确保新公钥独占一行"""
+    prefix = '\n' if existing and not existing.endswith('\n') else ''
+    return f"{prefix}{public_key}\n"
+
 class SSHKeyManager:
     def __init__(self):
         """初始化SSH密钥管理器"""
-        self.ssh_dir = os.path.expanduser(PATH_CONFIG['ssh_dir'])
-        self.private_key_path = os.path.join(self.ssh_dir, KEY_CONFIG['key_filename'])
+        self.ssh_dir = RESOLVED_PATHS['ssh_dir']
+        key_filename = KEY_CONFIG['key_filename'] or f"id_{KEY_CONFIG['key_type']}"
+        self.private_key_path = os.path.join(self.ssh_dir, key_filename)
         self.public_key_path = f"{self.private_key_path}.pub"
+        # 首次读取或生成后缓存公钥内容
+        self._public_key: Optional[str] = None
         
     def ensure_ssh_directory(self) -> None:
         """确保SSH目录存在且权限正确"""
@@ -33,47 +242,55 @@ class SSHKeyManager:
             raise
 
     def generate_key_pair(self) -> Tuple[str, str]:
-        """使用系统ssh-keygen生成SSH密钥对"""
+        """生成SSH密钥对（支持rsa和ed25519）"""
+        if self._public_key:
+            return self.private_key_path, self._public_key
         try:
             self.ensure_ssh_directory()
             if os.path.exists(self.private_key_path):
                 logger.info("SSH密钥对已存在")
                 with open(self.public_key_path, 'r') as f:
-                    public_key = f.read().strip()
-                return self.private_key_path, public_key
-
-            # 使用ssh-keygen命令生成密钥对
-            import subprocess
-            cmd = [
-                'ssh-keygen',
-                '-t', KEY_CONFIG['key_type'],
-                '-b', str(KEY_CONFIG['key_bits']),
-                '-f', self.private_key_path,
-                '-N', ''  # 空密码短语
-            ]
+                    self._public_key = f.read().strip()
+                return self.private_key_path, self._public_key
+
+            # 在进程内生成密钥对，避免调用ssh-keygen子进程
+            if KEY_CONFIG['key_type'] == 'ed25519':
+                # paramiko不支持生成和写入Ed25519私钥，使用cryptography处理
+                key = ed25519.Ed25519PrivateKey.generate()
+                private_bytes = key.private_bytes(
+                    serialization.Encoding.PEM,
+                    serialization.PrivateFormat.OpenSSH,
+                    serialization.NoEncryption()  # 空密码短语
+                )
+                fd = os.open(self.private_key_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                             PERMISSION_CONFIG['private_key'])
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(private_bytes)
+                public_key = key.public_key().public_bytes(
+                    serialization.Encoding.OpenSSH,
+                    serialization.PublicFormat.OpenSSH
+                ).decode()
+            elif KEY_CONFIG['key_type'] == 'rsa':
+                key_bits = KEY_CONFIG['key_bits']
+                if key_bits < _MIN_RSA_KEY_BITS:
+                    if key_bits:
+                        logger.warning(f"RSA密钥位数{key_bits}过低，改为生成{_MIN_RSA_KEY_BITS}位密钥")
+                    key_bits = _MIN_RSA_KEY_BITS
+                key = paramiko.RSAKey.generate(key_bits)
+                key.write_private_key_file(self.private_key_path)
+                public_key = f"{key.get_name()} {key.get_base64()}"
+            else:
+                raise ValueError(f"不支持的密钥类型: {KEY_CONFIG['key_type']}")
             
             if KEY_CONFIG['key_comment']:
-                cmd.extend(['-C', KEY_CONFIG['key_comment']])
-            
-            # 执行ssh-keygen命令
-            process = subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            
-            if process.returncode != 0:
-                raise Exception(f"ssh-keygen失败: {process.stderr}")
+                public_key = f"{public_key} {KEY_CONFIG['key_comment']}"
+            Path(self.public_key_path).write_text(public_key + "\n")
             
             # 设置正确的文件权限
             os.chmod(self.private_key_path, PERMISSION_CONFIG['private_key'])
             os.chmod(self.public_key_path, PERMISSION_CONFIG['public_key'])
             
-            # 读取生成的公钥
-            with open(self.public_key_path, 'r') as f:
-                public_key = f.read().strip()
-            
+            self._public_key = public_key
             logger.info("成功生成新的SSH密钥对")
             return self.private_key_path, public_key
             
@@ -81,60 +298,120 @@ class SSHKeyManager:
             logger.error(f"生成SSH密钥对失败: {str(e)}")
             raise
 
+    def _build_deploy_script(self) -> str:
+        """生成部署前准备远程目录的脚本"""
+        # 必须成功的初始化命令，以 && 串联，任一失败即中止
+        setup_commands = [
+            # 检查并创建.ssh目录
+            'mkdir -p ~/.ssh',
+            
+            # 设置正确的权限
+            'chmod 700 ~',  # 用户主目录权限
+            'chmod 700 ~/.ssh',
+            
+            # 备份现有的authorized_keys（如果存在）
+            '{ cp ~/.ssh/authorized_keys ~/.ssh/authorized_keys.bak 2>/dev/null || true; }'
+        ]
+        
+        return " && ".join(setup_commands)
+
+    def _check_deploy_output(self, out: str, err: str, exit_status: int) -> None:
+        """检查部署脚本的输出，执行失败时抛出异常"""
+        if err:
+            logger.warning(f"执行部署脚本时出现警告:\n{err}")
+        if out.strip():
+            logger.info(f"部署脚本输出:\n{out.strip()}")
+        if exit_status != 0:
+            raise Exception(f"远程命令执行失败，退出码: {exit_status}")
+
+    def _deploy_public_key_via_shell(self, ssh: paramiko.SSHClient, public_key: str) -> None:
+        """远程未启用sftp子系统时，通过exec通道读取authorized_keys并经stdin追加公钥"""
+        out, _, _ = _run(ssh, _READ_AUTHORIZED_KEYS_COMMAND)
+        existing = out.decode()
+        if _key_present(public_key, existing):
+            out, err, exit_status = _run(ssh, _FIX_PERMISSIONS_COMMAND)
+            self._check_deploy_output(out.decode(), err.decode().strip(), exit_status)
+            logger.info("公钥已存在于authorized_keys中，无需重新部署")
+            return
+        
+        out, err, exit_status = _run(
+            ssh,
+            f"{self._build_deploy_script()} && {_APPEND_AUTHORIZED_KEYS_COMMAND}",
+            stdin=_authorized_keys_entry(public_key, existing).encode()
+        )
+        self._check_deploy_output(out.decode(), err.decode().strip(), exit_status)
+        
+        out, err, exit_status = _run(ssh, _RESTORECON_COMMAND)
+        self._check_deploy_output(out.decode(), err.decode().strip(), exit_status)
+        logger.info("成功部署公钥到远程服务器")
+
+    async def _deploy_public_key_via_shell_async(self, conn: 'asyncssh.SSHClientConnection', public_key: str,
+                                                 hostname: str) -> None:
+        """_deploy_public_key_via_shell的asyncssh版本"""
+        result = await conn.run(_READ_AUTHORIZED_KEYS_COMMAND)
+        existing = result.stdout
+        if _key_present(public_key, existing):
+            result = await conn.run(_FIX_PERMISSIONS_COMMAND)
+            self._check_deploy_output(result.stdout, result.stderr.strip(), result.exit_status)
+            logger.info(f"公钥已存在于authorized_keys中，无需重新部署: {hostname}")
+            return
+        
+        result = await conn.run(
+            f"{self._build_deploy_script()} && {_APPEND_AUTHORIZED_KEYS_COMMAND}",
+            input=_authorized_keys_entry(public_key, existing)
+        )
+        self._check_deploy_output(result.stdout, result.stderr.strip(), result.exit_status)
+        
+        result = await conn.run(_RESTORECON_COMMAND)
+        self._check_deploy_output(result.stdout, result.stderr.strip(), result.exit_status)
+        logger.info(f"成功部署公钥到远程服务器: {hostname}")
+
     def deploy_public_key(self, hostname: str, username: str, password: str, port: int = 22) -> bool:
         """部署公钥到远程服务器"""
         try:
             _, public_key = self.generate_key_pair()
             
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(hostname, port, username, password)
+            conn_info = {
+                'hostname': hostname,
+                'port': port,
+                'username': username,
+                'password': password
+            }
             
-            # 检查并设置用户主目录权限
-            commands = [
-                # 检查并创建.ssh目录
-                'mkdir -p ~/.ssh',
+            ssh, sftp = with_client(conn_info, lambda ssh: (ssh, _open_sftp(ssh)))
+            if sftp is None:
+                logger.warning(_SFTP_UNAVAILABLE_HINT)
+                self._deploy_public_key_via_shell(ssh, public_key)
+                return True
+            try:
+                try:
+                    with sftp.open(_REMOTE_AUTHORIZED_KEYS, 'r') as f:
+                        existing = f.read().decode()
+                except IOError:
+                    existing = ''
                 
-                # 设置正确的权限
-                'chmod 700 ~',  # 用户主目录权限
-                'chmod 700 ~/.ssh',
-                'chmod 600 ~/.ssh/authorized_keys 2>/dev/null || true',
+                # 公钥已部署时跳过备份和追加，但仍按完整部署流程修正权限以免sshd拒绝公钥认证
+                if _key_present(public_key, existing):
+                    for path, permission in _REMOTE_PERMISSIONS:
+                        sftp.chmod(path, PERMISSION_CONFIG[permission])
+                    logger.info("公钥已存在于authorized_keys中，无需重新部署")
+                    return True
                 
-                # 备份现有的authorized_keys（如果存在）
-                'cp ~/.ssh/authorized_keys ~/.ssh/authorized_keys.bak 2>/dev/null || true',
+                out, err, exit_status = _run(ssh, self._build_deploy_script())
+                self._check_deploy_output(out.decode(), err.decode().strip(), exit_status)
                 
-                # 添加新的公钥
-                f'echo "{public_key}" >> ~/.ssh/authorized_keys',
+                # 通过SFTP追加公钥，避免在shell命令中拼接密钥内容
+                with sftp.open(_REMOTE_AUTHORIZED_KEYS, 'a') as f:
+                    f.write(_authorized_keys_entry(public_key, existing))
                 
                 # 设置最终权限
-                'chmod 600 ~/.ssh/authorized_keys',
-                
-                # 检查SELinux上下文（如果存在）
-                'command -v restorecon >/dev/null && restorecon -R -v ~/.ssh 2>/dev/null || true',
-                
-                # 显示最终权限以供验证
-                'ls -la ~/.ssh/authorized_keys',
-                'ls -la ~/.ssh',
-                'ls -ld ~'
-            ]
-            
-            # 执行命令并收集输出
-            for cmd in commands:
-                stdin, stdout, stderr = ssh.exec_command(cmd)
-                err = stderr.read().decode().strip()
-                out = stdout.read().decode().strip()
-                if err:
-                    logger.warning(f"执行命令时出现警告: {cmd}\n错误信息: {err}")
-                if out:
-                    logger.info(f"命令输出: {cmd}\n{out}")
-            
-            # 验证authorized_keys文件内容
-            stdin, stdout, stderr = ssh.exec_command('cat ~/.ssh/authorized_keys')
-            content = stdout.read().decode().strip()
-            if public_key not in content:
-                raise Exception("公钥未能正确写入authorized_keys文件")
+                sftp.chmod(_REMOTE_AUTHORIZED_KEYS, PERMISSION_CONFIG['authorized_keys'])
+            finally:
+                sftp.close()
+            
+            out, err, exit_status = _run(ssh, _RESTORECON_COMMAND)
+            self._check_deploy_output(out.decode(), err.decode().strip(), exit_status)
             
-            ssh.close()
             logger.info("成功部署公钥到远程服务器")
             return True
             
@@ -142,41 +419,144 @@ class SSHKeyManager:
             logger.error(f"部署公钥失败: {str(e)}")
             return False
 
+    async def deploy_public_key_async(self, conn_info: Dict[str, any]) -> bool:
+        """使用asyncssh部署公钥到远程服务器"""
+        try:
+            _, public_key = self.generate_key_pair()
+            async with asyncssh.connect(
+                conn_info['hostname'],
+                port=conn_info['port'],
+                username=conn_info['username'],
+                password=conn_info['password'],
+                known_hosts=None,  # 与paramiko的AutoAddPolicy行为一致
+                connect_timeout=SSH_CONFIG['connect_timeout']
+            ) as conn:
+                try:
+                    sftp = await conn.start_sftp_client()
+                except asyncssh.ChannelOpenError as e:
+                    logger.warning(f"{_SFTP_UNAVAILABLE_HINT} ({conn_info['hostname']}): {str(e)}")
+                    await self._deploy_public_key_via_shell_async(conn, public_key, conn_info['hostname'])
+                    return True
+                async with sftp:
+                    try:
+                        async with sftp.open(_REMOTE_AUTHORIZED_KEYS, 'r') as f:
+                            existing = await f.read()
+                    except asyncssh.SFTPError:
+                        # 与paramiko分支捕获IOError一致：文件不存在或不可读时都按空内容处理
+                        existing = ''
+                    
+                    if _key_present(public_key, existing):
+                        for path, permission in _REMOTE_PERMISSIONS:
+                            await sftp.chmod(path, PERMISSION_CONFIG[permission])
+                        logger.info(f"公钥已存在于authorized_keys中，无需重新部署: {conn_info['hostname']}")
+                        return True
+                    
+                    result = await conn.run(self._build_deploy_script())
+                    self._check_deploy_output(result.stdout, result.stderr.strip(), result.exit_status)
+                    
+                    async with sftp.open(_REMOTE_AUTHORIZED_KEYS, 'a') as f:
+                        await f.write(_authorized_keys_entry(public_key, existing))
+                    await sftp.chmod(_REMOTE_AUTHORIZED_KEYS, PERMISSION_CONFIG['authorized_keys'])
+                
+                result = await conn.run(_RESTORECON_COMMAND)
+                self._check_deploy_output(result.stdout, result.stderr.strip(), result.exit_status)
+            
+            logger.info(f"成功部署公钥到远程服务器: {conn_info['hostname']}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"部署公钥失败 ({conn_info['hostname']}): {str(e)}")
+            return False
+
+    async def verify_connection_async(self, conn_info: Dict[str, any]) -> bool:
+        """使用asyncssh验证SSH密钥认证是否成功"""
+        try:
+            async with asyncssh.connect(
+                conn_info['hostname'],
+                port=conn_info['port'],
+                username=conn_info['username'],
+                client_keys=[self.private_key_path],
+                password=None,  # 仅允许密钥认证
+                agent_path=None,
+                known_hosts=None,
+                connect_timeout=SSH_CONFIG['connect_timeout']
+            ) as conn:
+                result = await conn.run('echo "Connection successful"')
+            
+            if result.exit_status == 0:
+                logger.info(f"SSH密钥认证验证成功: {conn_info['hostname']}")
+                return True
+            logger.error(f"SSH密钥认证验证失败 ({conn_info['hostname']}): {result.stderr}")
+            return False
+            
+        except Exception as e:
+            logger.error(f"SSH密钥认证验证失败 ({conn_info['hostname']}): {str(e)}")
+            return False
+
     def verify_connection(self, hostname: str, username: str, port: int = 22) -> bool:
         """验证SSH密钥认证是否成功"""
         try:
-            import subprocess
-            # 构建SSH命令
-            cmd = [
-                'ssh',
-                '-i', self.private_key_path,  # 指定私钥
-                '-o', 'PasswordAuthentication=no',  # 禁用密码认证
-                '-o', 'StrictHostKeyChecking=no',  # 禁用主机密钥检查
-                '-o', 'BatchMode=yes',  # 禁用交互式提示
-                '-p', str(port),  # 指定端口
-                f'{username}@{hostname}',
-                'echo "Connection successful"'  # 测试命令
-            ]
-            
-            # 执行SSH连接测试
-            process = subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                timeout=10  # 设置超时时间
-            )
+            # 仅使用私钥认证，禁用密码、ssh-agent和默认密钥
+            conn_info = {
+                'hostname': hostname,
+                'port': port,
+                'username': username,
+                'key_filename': self.private_key_path
+            }
+            out, err, _ = with_client(conn_info, lambda ssh: _run(ssh, 'echo "Connection successful"'))
             
-            if process.returncode == 0:
+            if out.decode().strip() == "Connection successful":
                 logger.info("SSH密钥认证验证成功")
                 return True
             else:
-                logger.error(f"SSH密钥认证验证失败: {process.stderr}")
+                logger.error(f"SSH密钥认证验证失败: {err.decode().strip()}")
                 return False
                 
-        except subprocess.TimeoutExpired:
+        except socket.timeout:
             logger.error("SSH连接超时")
             return False
         except Exception as e:
             logger.error(f"SSH密钥认证验证失败: {str(e)}")
-            return False 
\ No newline at end of file
+            return False
+
+    def inspect_remote_config(self, ssh: paramiko.SSHClient) -> Dict[str, Optional[Dict[str, str]]]:
+        """在单个通道内收集远程sshd配置和相关目录权限，sshd_config不可读时sshd为None"""
+        script = (
+            "echo '##SSHD##'; "
+            "grep -E '^(PubkeyAuthentication|PasswordAuthentication|PermitRootLogin|AuthorizedKeysFile)' "
+            "/etc/ssh/sshd_config; "
+            # grep退出码为2表示文件不存在或无读取权限（1仅表示没有匹配项）
+            "[ $? -le 1 ] || echo '##SSHD_UNREADABLE##'; "
+            "echo '##PERMS##'; "
+            # stat -c为GNU/busybox语法，BSD/macOS使用stat -f；两者都不支持时输出?表示权限未知
+            "for p in ~ ~/.ssh ~/.ssh/authorized_keys; do "
+            "[ -e \"$p\" ] || continue; "
+            "stat -c '%a %n' \"$p\" 2>/dev/null || stat -f '%Lp %N' \"$p\" 2>/dev/null || echo \"? $p\"; "
+            "done; "
+            "echo '##END##'"
+        )
+        out, err, _ = _run(ssh, script)
+        if err.strip():
+            logger.warning(f"检查远程配置时出现警告:\n{err.decode().strip()}")
+        sections = _split_sections(out.decode())
+        
+        sshd: Optional[Dict[str, str]] = None
+        if 'SSHD_UNREADABLE' not in sections:
+            sshd = {}
+            for line in sections.get('SSHD', []):
+                # 配置项与值之间可以用空白或等号分隔
+                key, *value = re.split(r'[\s=]+', line, 1)
+                # sshd以首次出现的配置项为准
+                sshd.setdefault(key, value[0].strip() if value else '')
+        
+        permissions: Dict[str, str] = {}
+        for line in sections.get('PERMS', []):
+            mode, _, path = line.partition(' ')
+            if path.endswith('/.ssh/authorized_keys'):
+                permissions['authorized_keys'] = mode
+            elif path.endswith('/.ssh'):
+                permissions['ssh_dir'] = mode
+            else:
+                permissions['home'] = mode
+        
+        return {'sshd': sshd, 'permissions': permissions}
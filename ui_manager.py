@@ -4,12 +4,15 @@
 """
 import os
 import sys
+import logging
 import platform
+import signal
 import socket
-import time
-from typing import Dict, Optional
+import threading
+from typing import Dict, List, Optional, Tuple
 import getpass
-from config import SSH_CONFIG, PATH_CONFIG
+import importlib.util
+from config import SSH_CONFIG, KEY_CONFIG, RESOLVED_PATHS
 import shutil
 
 class Colors:
@@ -23,67 +26,169 @@ class Colors:
     BOLD = '\033[1m'
     UNDERLINE = '\033[4m'
 
+# 欢迎界面横幅
+BANNER_LINES = [
+    "╔══════════════════════════════════════════════════════════╗",
+    "║                SSH密钥自动化部署工具                     ║",
+    "╚══════════════════════════════════════════════════════════╝"
+]
+
+# 主菜单项: (编号, 标题, 说明)
+MENU_ITEMS = [
+    ("1", "检测环境配置", "检查Python版本、依赖包和权限"),
+    ("2", "测试远程连接", "测试网络连接和SSH服务"),
+    ("3", "部署SSH密钥", "生成并部署SSH密钥"),
+    ("4", "检查远程服务器配置", "检查SSH服务和安全设置"),
+    ("5", "查看当前配置", "显示当前的连接配置"),
+    ("6", "修改配置", "更新服务器连接信息"),
+    ("0", "退出程序", "保存配置并退出")
+]
+
+class _SpinnerLogHandler(logging.Handler):
+    """Spinner运行期间代替根日志处理器，输出日志前先清除动画所在行，避免两者混在同一行"""
+
+    def __init__(self, spinner: 'Spinner', handlers: List[logging.Handler]):
+        super().__init__()
+        self._spinner = spinner
+        self._handlers = handlers
+
+    def emit(self, record: logging.LogRecord):
+        with self._spinner._lock:
+            self._spinner._clear_line()
+            for handler in self._handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+
+class Spinner:
+    """在后台线程中显示加载动画，仅在实际任务执行期间运行"""
+    FRAMES = ['⠋', '⠙', '⠹', '⠸', '⠼', '⠴', '⠦', '⠧', '⠇', '⠏']
+
+    def __init__(self, message: str, interval: float = 0.1):
+        self.message = message
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # 动画线程与日志输出共用的锁，保证清行、输出日志和重绘不会交错
+        self._lock = threading.Lock()
+        self._saved_handlers: Optional[List[logging.Handler]] = None
+
+    def start(self):
+        """启动动画线程，并接管根日志处理器直到动画停止"""
+        root = logging.getLogger()
+        self._saved_handlers = root.handlers[:]
+        root.handlers = [_SpinnerLogHandler(self, self._saved_handlers)]
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._spin, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止动画、恢复日志处理器并输出最终状态行"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._saved_handlers is not None:
+            logging.getLogger().handlers = self._saved_handlers
+            self._saved_handlers = None
+        with self._lock:
+            self._clear_line()
+            sys.stdout.write(f"{Colors.BLUE}⠿{Colors.ENDC} {self.message}\n")
+            sys.stdout.flush()
+
+    def _clear_line(self):
+        """清除动画所在行，下一帧会重新绘制"""
+        sys.stdout.write("\r\033[K")
+        sys.stdout.flush()
+
+    def _spin(self):
+        i = 0
+        while not self._stop_event.is_set():
+            with self._lock:
+                sys.stdout.write(f"\r{Colors.BLUE}{self.FRAMES[i % len(self.FRAMES)]}{Colors.ENDC} {self.message}")
+                sys.stdout.flush()
+            i += 1
+            self._stop_event.wait(self.interval)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
 class UIManager:
     def __init__(self):
         """初始化用户界面管理器"""
         self.system = platform.system()
         self.is_windows = self.system == "Windows"
         self.ssh_dir = self._get_ssh_dir()
+        self._py_ver = platform.python_version()
         # Windows系统启用彩色输出
         if self.is_windows:
             os.system('color')
-        self.terminal_width = shutil.get_terminal_size().columns
+        self._menu = "".join(
+            f"{Colors.BLUE}[{num}]{Colors.ENDC} {Colors.BOLD}{title}{Colors.ENDC}\n"
+            f"    {Colors.WARNING}{desc}{Colors.ENDC}\n"
+            for num, title, desc in MENU_ITEMS
+        )
+        self._menu_choices = {num for num, _, _ in MENU_ITEMS}
+        self._build_layout()
+        # 终端尺寸变化时（仅Unix支持SIGWINCH）重新计算布局；
+        # signal.signal只能在主线程调用，在其他线程中创建时不监听尺寸变化
+        self._layout_stale = False
+        if hasattr(signal, 'SIGWINCH') and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGWINCH, self._on_terminal_resize)
+        # 环境检测结果在运行期间不会变化，首次检测后缓存
+        self._env_checks: Optional[List[Tuple[str, bool]]] = None
+        # 上次绘制的进度条长度，用于跳过无变化的重绘
+        self._last_filled = -1
 
     def _get_ssh_dir(self) -> str:
         """获取SSH配置目录的平台相关路径"""
         if self.is_windows:
             return os.path.expandvars(r"%USERPROFILE%\.ssh")
-        return os.path.expanduser("~/.ssh")
+        return RESOLVED_PATHS['ssh_dir']
 
     def clear_screen(self):
         """清除屏幕"""
         os.system('cls' if self.is_windows else 'clear')
 
+    def _build_layout(self):
+        """根据当前终端宽度预先生成横幅文本"""
+        self.terminal_width = shutil.get_terminal_size().columns
+        # 居中显示banner，并与系统信息合并为一个字符串
+        self._banner = "".join(
+            " " * ((self.terminal_width - len(line)) // 2) +
+            Colors.BOLD + Colors.BLUE + line + Colors.ENDC + "\n"
+            for line in BANNER_LINES
+        ) + (
+            f"\n{Colors.BOLD}系统信息:{Colors.ENDC}\n"
+            f"├─ 系统类型: {Colors.GREEN}{self.system}{Colors.ENDC}\n"
+            f"├─ SSH目录: {Colors.GREEN}{self.ssh_dir}{Colors.ENDC}\n"
+            f"└─ Python版本: {Colors.GREEN}{self._py_ver}{Colors.ENDC}\n"
+            "\n" + "═" * self.terminal_width + "\n"
+        )
+
+    def _on_terminal_resize(self, signum, frame):
+        """SIGWINCH处理函数，标记布局需要重新计算"""
+        self._layout_stale = True
+
     def show_banner(self):
         """显示欢迎界面"""
         self.clear_screen()
-        banner = [
-            "╔══════════════════════════════════════════════════════════╗",
-            "║                SSH密钥自动化部署工具                     ║",
-            "╚══════════════════════════════════════════════════════════╝"
-        ]
-        
-        # 居中显示banner
-        for line in banner:
-            padding = (self.terminal_width - len(line)) // 2
-            print(" " * padding + Colors.BOLD + Colors.BLUE + line + Colors.ENDC)
-        
-        print(f"\n{Colors.BOLD}系统信息:{Colors.ENDC}")
-        print(f"├─ 系统类型: {Colors.GREEN}{self.system}{Colors.ENDC}")
-        print(f"├─ SSH目录: {Colors.GREEN}{self.ssh_dir}{Colors.ENDC}")
-        print(f"└─ Python版本: {Colors.GREEN}{platform.python_version()}{Colors.ENDC}")
-        print("\n" + "═" * self.terminal_width)
+        if self._layout_stale:
+            self._layout_stale = False
+            self._build_layout()
+        sys.stdout.write(self._banner)
+        sys.stdout.flush()
 
     def show_menu(self) -> str:
         """显示主菜单并获取用户选择"""
-        menu_items = [
-            ("1", "检测环境配置", "检查Python版本、依赖包和权限"),
-            ("2", "测试远程连接", "测试网络连接和SSH服务"),
-            ("3", "部署SSH密钥", "生成并部署SSH密钥"),
-            ("4", "检查远程服务器配置", "检查SSH服务和安全设置"),
-            ("5", "查看当前配置", "显示当前的连接配置"),
-            ("6", "修改配置", "更新服务器连接信息"),
-            ("0", "退出程序", "保存配置并退出")
-        ]
-        
-        print(f"\n{Colors.BOLD}可用操作：{Colors.ENDC}")
-        for num, title, desc in menu_items:
-            print(f"{Colors.BLUE}[{num}]{Colors.ENDC} {Colors.BOLD}{title}{Colors.ENDC}")
-            print(f"    {Colors.WARNING}{desc}{Colors.ENDC}")
+        sys.stdout.write(f"\n{Colors.BOLD}可用操作：{Colors.ENDC}\n" + self._menu)
         
         while True:
             choice = input(f"\n{Colors.BOLD}请输入选项编号 [0-6]: {Colors.ENDC}").strip()
-            if choice in ['0', '1', '2', '3', '4', '5', '6']:
+            if choice in self._menu_choices:
                 return choice
             print(f"{Colors.FAIL}无效的选项，请重新输入！{Colors.ENDC}")
 
@@ -117,47 +222,55 @@ class UIManager:
         print(f"\n{Colors.BOLD}环境检测{Colors.ENDC}")
         print("─" * self.terminal_width)
         
-        checks = [
-            ("Python版本检查", self._check_python_version()),
-            ("SSH目录权限检查", self._check_ssh_dir_permissions()),
-            ("系统依赖检查", self._check_system_dependencies())
-        ]
+        if self._env_checks is None:
+            with Spinner("正在检查环境配置"):
+                self._env_checks = [
+                    ("Python版本检查", self._check_python_version()),
+                    ("SSH目录权限检查", self._check_ssh_dir_permissions()),
+                    ("系统依赖检查", self._check_system_dependencies())
+                ]
         
         all_passed = True
-        for name, passed in checks:
-            self.show_progress(f"正在检查 {name}", 1)
+        for name, passed in self._env_checks:
             status = f"{Colors.GREEN}✓{Colors.ENDC}" if passed else f"{Colors.FAIL}✗{Colors.ENDC}"
             print(f"{status} {name}")
             all_passed = all_passed and passed
         
+        if KEY_CONFIG['key_type'] == 'rsa' and KEY_CONFIG['key_bits'] >= 4096:
+            print(f"{Colors.WARNING}! 当前配置为RSA-{KEY_CONFIG['key_bits']}，密钥生成和每次认证签名都明显慢于"
+                  f"Ed25519，建议将key_type改为ed25519{Colors.ENDC}")
+        
         print("─" * self.terminal_width)
         return all_passed
 
     def show_progress_bar(self, iteration, total, prefix='', suffix='', length=50):
-        """显示进度条"""
-        percent = ("{0:.1f}").format(100 * (iteration / float(total)))
+        """显示进度条，仅在进度条长度变化时重绘"""
         filled_length = int(length * iteration // total)
+        if filled_length == self._last_filled and iteration != total:
+            return
+        self._last_filled = filled_length
         bar = '█' * filled_length + '░' * (length - filled_length)
-        print(f'\r{prefix} |{bar}| {percent}% {suffix}', end='\r')
+        sys.stdout.write(f'\r{prefix} |{bar}| {100 * iteration / total:5.1f}% {suffix}')
         if iteration == total:
-            print()
+            sys.stdout.write('\n')
+            self._last_filled = -1
+        sys.stdout.flush()
 
-    def test_connection(self, conn_info: Dict[str, any]) -> bool:
-        """测试远程连接"""
+    def test_connection(self, conn_info: Dict[str, any], probe_tcp: bool = True) -> bool:
+        """测试远程连接，probe_tcp为False时由调用方直接建立SSH连接，跳过TCP探测"""
         print(f"\n{Colors.BOLD}连接测试{Colors.ENDC}")
         print("─" * self.terminal_width)
         
         try:
             print(f"正在连接 {Colors.BLUE}{conn_info['username']}@{conn_info['hostname']}:{conn_info['port']}{Colors.ENDC}")
+            if not probe_tcp:
+                return True
             
-            # 显示连接进度
-            for i in range(101):
-                self.show_progress_bar(i, 100, prefix='连接进度:', suffix='完成')
-                time.sleep(0.01)
+            print("连接中...", end='\r', flush=True)
             
             # 测试TCP连接
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(5)
+            sock.settimeout(SSH_CONFIG['connect_timeout'])
             result = sock.connect_ex((conn_info['hostname'], conn_info['port']))
             sock.close()
             
@@ -172,14 +285,6 @@ class UIManager:
             print(f"{Colors.FAIL}✗ 连接测试失败: {str(e)}{Colors.ENDC}")
             return False
 
-    def show_progress(self, message: str, duration: int = 3):
-        """显示进度动画"""
-        spinner = ['⠋', '⠙', '⠹', '⠸', '⠼', '⠴', '⠦', '⠧', '⠇', '⠏']
-        for i in range(duration * 10):
-            print(f"\r{Colors.BLUE}{spinner[i % len(spinner)]}{Colors.ENDC} {message}", end='', flush=True)
-            time.sleep(0.1)
-        print()
-
     def show_current_config(self):
         """显示当前配置"""
         print(f"\n{Colors.BOLD}当前配置信息{Colors.ENDC}")
@@ -228,38 +333,45 @@ class UIManager:
 
     def _check_system_dependencies(self) -> bool:
         """检查系统依赖"""
-        try:
-            import paramiko
-            import cryptography
-            import bcrypt
-            return True
-        except ImportError:
-            return False
+        # 仅查找模块而不实际导入，避免导入开销
+        return all(
+            importlib.util.find_spec(name) is not None
+            for name in ('paramiko', 'cryptography', 'bcrypt')
+        )
 
-    def check_remote_config(self, ssh_client) -> bool:
-        """检查远程服务器配置"""
-        print("\n正在检查远程服务器配置...")
+    def check_remote_config(self, report: Dict[str, Optional[Dict[str, str]]]) -> bool:
+        """显示远程服务器配置检查结果"""
+        sshd = report['sshd']
+        permissions = report['permissions']
         
-        try:
-            # 检查 sshd_config
-            stdin, stdout, stderr = ssh_client.exec_command(
-                "grep -E '^PubkeyAuthentication|^PasswordAuthentication' /etc/ssh/sshd_config"
-            )
-            config = stdout.read().decode()
-            
-            checks = {
-                "PubkeyAuthentication": ("yes" in config.lower(), "是否启用公钥认证"),
-                "PasswordAuthentication": ("yes" in config.lower(), "是否启用密码认证")
-            }
-            
-            all_passed = True
-            for key, (passed, desc) in checks.items():
-                status = "✅" if passed else "❌"
-                print(f"{status} {desc} ({key})")
-                all_passed = all_passed and passed
-            
-            return all_passed
-            
-        except Exception as e:
-            print(f"❌ 检查失败: {str(e)}")
-            return False 
\ No newline at end of file
+        checks = []
+        for key, desc in [("PubkeyAuthentication", "是否启用公钥认证"),
+                          ("PasswordAuthentication", "是否启用密码认证")]:
+            if sshd is None:
+                checks.append((f"{key}: 无法读取sshd_config", False, desc))
+            else:
+                # 未显式配置时使用sshd的默认值
+                checks.append((key, sshd.get(key, "yes").lower() == "yes", desc))
+        
+        # sshd要求这些路径不能被组用户或其他用户写入
+        for key, desc in [("home", "用户主目录权限"), ("ssh_dir", ".ssh目录权限"),
+                          ("authorized_keys", "authorized_keys文件权限")]:
+            mode = permissions.get(key)
+            if mode == "?":
+                # 远程stat命令不可用，无法判断权限，不计为失败
+                checks.append(("未知", None, desc))
+            else:
+                passed = mode is not None and int(mode, 8) & 0o022 == 0
+                checks.append((mode or "不存在", passed, desc))
+        
+        all_passed = True
+        for key, passed, desc in checks:
+            status = "❔" if passed is None else "✅" if passed else "❌"
+            print(f"{status} {desc} ({key})")
+            all_passed = all_passed and passed is not False
+        
+        for key in ("PermitRootLogin", "AuthorizedKeysFile"):
+            if sshd and key in sshd:
+                print(f"ℹ️  {key}: {sshd[key]}")
+        
+        return all_passed